@@ -0,0 +1,166 @@
+# Streaming reductions for uploads too large to load into one DataFrame.
+# Every helper reads the file in fixed-size chunks, so memory stays bounded
+# by CHUNK_ROWS regardless of the input size.
+import os
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS") or "500000")
+QUANTILE_BINS = 20000
+
+
+def iter_chunks(path, columns=None, chunksize: int = CHUNK_ROWS, **read_csv_kwargs):
+    """Yield DataFrame chunks of a CSV, reading only the requested columns."""
+    yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, **read_csv_kwargs)
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64")
+    return values[~np.isnan(values)]
+
+
+def chunked_stats(path, columns: list, **read_csv_kwargs) -> dict:
+    """
+    One pass over the file returning count, sum, mean, min, max and std
+    for each numeric column. Each chunk's count/mean/M2 is merged with
+    Chan's parallel update, which stays accurate for large values such as
+    epoch timestamps where a sum of squares would cancel out.
+    """
+    acc = {col: {"count": 0, "sum": 0.0, "mean": 0.0, "m2": 0.0, "min": np.inf, "max": -np.inf} for col in columns}
+    for chunk in iter_chunks(path, columns, **read_csv_kwargs):
+        for col in columns:
+            values = _numeric(chunk[col])
+            if values.size == 0:
+                continue
+            a = acc[col]
+            n_b = values.size
+            mean_b = float(values.mean())
+            m2_b = float(np.square(values - mean_b).sum())
+            n = a["count"] + n_b
+            delta = mean_b - a["mean"]
+            a["mean"] += delta * n_b / n
+            a["m2"] += m2_b + delta * delta * a["count"] * n_b / n
+            a["count"] = n
+            a["sum"] += float(values.sum())
+            a["min"] = min(a["min"], float(values.min()))
+            a["max"] = max(a["max"], float(values.max()))
+
+    stats = {}
+    for col, a in acc.items():
+        n = a["count"]
+        var = a["m2"] / (n - 1) if n > 1 else None
+        stats[col] = {
+            "count": n,
+            "sum": a["sum"],
+            "mean": a["mean"] if n else None,
+            "min": a["min"] if n else None,
+            "max": a["max"] if n else None,
+            "std": float(np.sqrt(var)) if var is not None else None,
+        }
+    return stats
+
+
+def chunked_sum(path, column: str, **read_csv_kwargs) -> float:
+    return chunked_stats(path, [column], **read_csv_kwargs)[column]["sum"]
+
+
+def chunked_mean(path, column: str, **read_csv_kwargs):
+    return chunked_stats(path, [column], **read_csv_kwargs)[column]["mean"]
+
+
+def approx_quantile(path, column: str, q: float = 0.5, bins: int = QUANTILE_BINS, **read_csv_kwargs):
+    """
+    Two-pass histogram quantile. The error is at most one bin width,
+    i.e. (max - min) / bins.
+    """
+    stats = chunked_stats(path, [column], **read_csv_kwargs)[column]
+    n = stats["count"]
+    if not n:
+        return None
+    lo, hi = stats["min"], stats["max"]
+    if lo == hi:
+        return lo
+
+    edges = np.linspace(lo, hi, bins + 1)
+    counts = np.zeros(bins, dtype="int64")
+    for chunk in iter_chunks(path, [column], **read_csv_kwargs):
+        counts += np.histogram(_numeric(chunk[column]), bins=edges)[0]
+
+    cumulative = np.cumsum(counts)
+
+    def value_at_rank(rank: int) -> float:
+        idx = min(int(np.searchsorted(cumulative, rank, side="right")), bins - 1)
+        before = cumulative[idx - 1] if idx > 0 else 0
+        within = (rank - before + 0.5) / counts[idx] if counts[idx] else 0.0
+        return float(edges[idx] + min(within, 1.0) * (edges[idx + 1] - edges[idx]))
+
+    # Same linear interpolation between neighbouring ranks as pandas' quantile
+    target = q * (n - 1)
+    lower, upper = int(np.floor(target)), int(np.ceil(target))
+    low_value = value_at_rank(lower)
+    if upper == lower:
+        return low_value
+    return low_value + (target - lower) * (value_at_rank(upper) - low_value)
+
+
+def approx_median(path, column: str, **kwargs):
+    return approx_quantile(path, column, 0.5, **kwargs)
+
+
+def chunked_corr(path, x: str, y: str, **read_csv_kwargs):
+    """Pearson correlation from streaming sums over rows where both columns are numeric."""
+    n = sx = sy = sxx = syy = sxy = 0.0
+    for chunk in iter_chunks(path, [x, y], **read_csv_kwargs):
+        xs = pd.to_numeric(chunk[x], errors="coerce").to_numpy(dtype="float64")
+        ys = pd.to_numeric(chunk[y], errors="coerce").to_numpy(dtype="float64")
+        mask = ~(np.isnan(xs) | np.isnan(ys))
+        xs, ys = xs[mask], ys[mask]
+        n += xs.size
+        sx += xs.sum()
+        sy += ys.sum()
+        sxx += np.dot(xs, xs)
+        syy += np.dot(ys, ys)
+        sxy += np.dot(xs, ys)
+
+    if n < 2:
+        return None
+    cov = sxy - sx * sy / n
+    var_x = sxx - sx * sx / n
+    var_y = syy - sy * sy / n
+    if var_x <= 0 or var_y <= 0:
+        return None
+    return float(cov / np.sqrt(var_x * var_y))
+
+
+def chunked_groupby(path, by, column: str, agg: str = "sum", **read_csv_kwargs) -> pd.Series:
+    """
+    Group-by aggregation (sum, count, mean, min, max) merged chunk by chunk.
+    Memory is bounded by the number of distinct groups, not by the row count.
+    """
+    if agg not in {"sum", "count", "mean", "min", "max"}:
+        raise ValueError(f"Unsupported aggregation: {agg}")
+    keys = [by] if isinstance(by, str) else list(by)
+
+    partial = None
+    for chunk in iter_chunks(path, keys + [column], **read_csv_kwargs):
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+        grouped = chunk.groupby(keys, sort=False)[column]
+        if agg in {"sum", "count", "mean"}:
+            part = pd.DataFrame({"sum": grouped.sum(), "count": grouped.count()})
+            partial = part if partial is None else partial.add(part, fill_value=0)
+        else:
+            part = getattr(grouped, agg)()
+            partial = part if partial is None else pd.concat([partial, part]).groupby(level=keys).agg(agg)
+
+    if partial is None:
+        return pd.Series(dtype="float64", name=column)
+    if agg == "sum":
+        result = partial["sum"]
+    elif agg == "count":
+        result = partial["count"].astype("int64")
+    elif agg == "mean":
+        result = partial["sum"] / partial["count"]
+    else:
+        result = partial
+    return result.rename(column)
@@ -1,16 +1,109 @@
 import re
 import traceback
-from google import genai
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
-import json
+from app.llm_utils import get_genai_client
 import subprocess
 import sys
 import tempfile
-from app.llm_controller import infer_expected_format  # <-- import for fallback
+from app.duckdb_session import describe_session, connection_preamble
+from app.result_codec import decode_result, coerce_to_schema
+from app.schema import value_schema, validate_result, placeholder_for, repair_result
+from app.utils import detect_edge_list_files, detect_date_files
+from app.shared_cache import cache_get, cache_set
+from app.serving import run_in_sandbox, sandbox_env, sandbox_affinity_preamble
 
 load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+# Repo root, so sandboxed scripts can import helper modules such as app.chunked
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LARGE_FILE_PROMPT = """
+    Large-file mode:
+    - These files are too large to load into memory: {large_files}
+    - NEVER call pd.read_csv on them without chunksize, and never build a DataFrame of the full file.
+    - Prefer SQL through DuckDB (it streams from disk), or pyarrow.dataset scanners, or pandas chunks.
+    - Ready-made streaming helpers (import them, do not reimplement):
+      from app.chunked import iter_chunks, chunked_stats, chunked_sum, chunked_mean, approx_median, approx_quantile, chunked_corr, chunked_groupby
+      chunked_stats(path, [cols]) -> {{col: {{count, sum, mean, min, max, std}}}}
+      approx_median(path, col) / approx_quantile(path, col, q) -> float
+      chunked_corr(path, x, y) -> float
+      chunked_groupby(path, by, col, agg="sum"|"count"|"mean"|"min"|"max") -> pandas Series
+    - Only small, aggregated results may be materialized.
+    """
+
+GRAPH_PROMPT = """
+    Graph fast path:
+    - These files are edge lists: {edge_files}
+    - Do NOT rebuild the graph with networkx. Use the built-in CSR graph helpers:
+      from app.graph_analysis import load_edge_list, graph_summary, shortest_path_length, shortest_path, network_graph_png, degree_histogram_png
+      g = load_edge_list(path)  # undirected by default; pass directed=True if the task says so
+      graph_summary(g) -> {{node_count, edge_count, highest_degree_node, average_degree, density, degrees, connected_components, diameter, average_shortest_path_length}}
+      shortest_path_length(g, "A", "B") -> int (None if unreachable); shortest_path(g, "A", "B") -> [labels]
+      network_graph_png(g, node_color=..., edge_color=...) -> base64 PNG string with labelled nodes
+      degree_histogram_png(g, color="green") -> base64 PNG string of the degree distribution
+    - All values returned are plain Python types and PNGs are already under 100kB.
+    """
+
+TIMESERIES_PROMPT = """
+    Time-series fast path:
+    - These files are keyed by a date column: {date_files}
+    - Load them with the built-in helpers instead of pd.read_csv; the date column is parsed once and cached:
+      from app.timeseries import load_timeseries, summary, correlation, rolling, cumulative, resample, date_of_max, date_of_min, line_chart_png, bar_chart_png, histogram_png
+      df = load_timeseries(path)  # sorted DataFrame with a DatetimeIndex; other columns already typed
+      summary(df, col) -> {{count, sum, mean, median, min, max, date_of_max, date_of_min}}
+      correlation(df, a, b) -> float; a/b may be columns or "day_of_month", "day_of_week", "month", "year"
+      rolling(df, col, window, how="mean"), cumulative(df, col, how="sum"), resample(df, col, rule="W", how="sum") -> Series
+      date_of_max(df, col) / date_of_min(df, col) -> "YYYY-MM-DD"
+      line_chart_png(series, color="red"), bar_chart_png(series, color="blue"), histogram_png(df, col, color="orange") -> base64 PNG string under 100kB
+      Group with df.groupby(col, observed=True)[value].sum() before bar_chart_png.
+    - Keep the script short: combine these calls and assign plain Python values to result_data.
+    """
+
+
+def helper_prompts(extra_files: list, large_files: list = None) -> str:
+    """Extra prompt sections advertising the built-in helpers that fit the uploads."""
+    sections = ""
+    if large_files:
+        sections += LARGE_FILE_PROMPT.format(large_files=large_files)
+    edge_files = detect_edge_list_files(extra_files)
+    if edge_files:
+        sections += GRAPH_PROMPT.format(edge_files=edge_files)
+    date_files = [f for f in detect_date_files(extra_files) if f not in (large_files or [])]
+    if date_files:
+        sections += TIMESERIES_PROMPT.format(date_files=date_files)
+    return sections
+
+# The script's real stdout is kept as a private pipe for the encoded result;
+# anything the generated code prints is sent to stderr instead.
+RESULT_PIPE_PREAMBLE = (
+    "import os as _os\n"
+    "_result_fd = _os.dup(1)\n"
+    "_os.dup2(2, 1)\n"
+)
+
+RESULT_PIPE_FOOTER = (
+    "\n\n"
+    "import sys as _sys\n"
+    "from app.result_codec import encode_result as _encode_result\n"
+    "_sys.stdout.flush()\n"
+    "with _os.fdopen(_result_fd, 'wb') as _result_pipe:\n"
+    "    _result_pipe.write(_encode_result(result_data))\n"
+)
+
+
+# Stands in for the request's working directory in cached code
+WORK_DIR_PLACEHOLDER = "{{WORK_DIR}}"
+
+
+def code_cache_key(task, notes, extra_files: list, session: dict = None, large_files: list = None) -> str:
+    """Key for generated code that doesn't depend on where this request's files live."""
+    files = [(os.path.basename(str(f)), os.path.getsize(f)) for f in extra_files if os.path.exists(f)]
+    tables = {name: info["columns"] for name, info in (session or {}).get("tables", {}).items()}
+    payload = json.dumps([task, notes, files, tables, bool(large_files)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
 def detect_required_files(code: str):
@@ -20,15 +113,7 @@ def detect_required_files(code: str):
     return set(file_patterns)
 
 
-def sanitize_result(result):
-    try:
-        json.dumps(result)  # Try serializing
-        return result
-    except TypeError:
-        return str(result)  # Fallback: convert to string
-
-
-async def generate_code(task: list, notes: str, extra_files: list) -> str:
+async def generate_code(task: list, notes: str, extra_files: list, session: dict = None, large_files: list = None) -> str:
     prompt = f"""You are a Python data analyst. Generate Python code to perform the given task. 
     - Add inline dependencies for all imports.  
     - No explanations. Output code only.  
@@ -53,7 +138,20 @@ async def generate_code(task: list, notes: str, extra_files: list) -> str:
     return result_data  
     """
 
-    response = client.models.generate_content(
+    if session and session.get("tables"):
+        prompt += f"""
+    Shared DuckDB session:
+    - A DuckDB connection named 'con' is ALREADY open. Do not create or close it.
+    - The uploaded files are already loaded into these tables:
+{describe_session(session)}
+    - Query them with con.execute("SELECT ...").df() (or .fetchall()) instead of re-reading the files.
+    - Push filtering and aggregation into SQL so only small results reach pandas.
+    - Tables you create with con are visible to later steps.
+    """
+
+    prompt += helper_prompts(extra_files, large_files)
+
+    response = await get_genai_client().aio.models.generate_content(
         model="gemini-2.0-flash-lite",
         contents=[prompt, task, notes]
     )
@@ -65,51 +163,44 @@ async def generate_code(task: list, notes: str, extra_files: list) -> str:
     return code_match
 
 
-def execute_code(code: str) -> (bool, dict): # type: ignore
+def execute_code(code: str, session: dict = None, work_dir: str = None) -> (bool, dict): # type: ignore
     try:
         required_files = detect_required_files(code)
-        missing_files = [f for f in required_files if not os.path.exists(f)]
+        missing_files = [f for f in required_files if not os.path.exists(os.path.join(work_dir or "", f))]
         if missing_files:
             return False, f"Missing required file(s): {missing_files}"
 
         with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as tmp_file:
             tmp_path = tmp_file.name
             tmp_file.write(
+                RESULT_PIPE_PREAMBLE +
+                sandbox_affinity_preamble() +
+                (connection_preamble(session) if session else "") +
                 code +
-                "\n\n"
-                "import json, sys, numpy, json\n"
-                "def convert_np(obj):\n"
-                "    if isinstance(obj, numpy.integer):\n"
-                "        return int(obj)\n"
-                "    elif isinstance(obj, numpy.floating):\n"
-                "        return float(obj)\n"
-                "    elif isinstance(obj, numpy.ndarray):\n"
-                "        return obj.tolist()\n"
-                "    raise TypeError(f\"Type {type(obj)} not serializable\")\n"
-                "with open(sys.argv[1], 'w') as f:\n"
-                "    json.dump(result_data, f, default=convert_np)\n"
+                ("\n\ntry:\n    con.close()\nexcept Exception:\n    pass\n" if session else "") +
+                RESULT_PIPE_FOOTER
             )
 
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as out_file:
-            out_path = out_file.name
+        env = sandbox_env(os.environ.copy())
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")]))
 
-        result = subprocess.run(
-            [sys.executable, tmp_path, out_path],
-            capture_output=True,
-            text=True
-        )
+        try:
+            result = subprocess.run(
+                [sys.executable, tmp_path],
+                capture_output=True,
+                env=env,
+                cwd=work_dir
+            )
+        finally:
+            os.remove(tmp_path)
 
         if result.returncode != 0:
-            return False, f"STDERR:\n{result.stderr}"
+            return False, f"STDERR:\n{result.stderr.decode('utf-8', errors='replace')}"
 
-        with open(out_path, "r") as f:
-            try:
-                result_data = json.load(f)
-            except json.JSONDecodeError:
-                result_data = None
-
-        os.remove(tmp_path)
-        os.remove(out_path)
+        try:
+            result_data = decode_result(result.stdout) if result.stdout else None
+        except ValueError:
+            result_data = None
 
         if result_data is not None:
             return True, result_data
@@ -120,7 +211,7 @@ def execute_code(code: str) -> (bool, dict): # type: ignore
         return False, traceback.format_exc()
 
 
-async def fix_code(task: str, faulty_code: str, error_message: str, extra_files: list) -> str:
+async def fix_code(task: str, faulty_code: str, error_message: str, extra_files: list, session: dict = None, large_files: list = None) -> str:
     prompt = f"""The following Python code was generated to perform the task: {task}
 Code:
 {faulty_code}
@@ -135,8 +226,13 @@ Do not invent column names or attributes. Read the files first to know what attr
 
 Do not add explanations or comments.
 """
+    if session and session.get("tables"):
+        prompt += f"""A DuckDB connection named 'con' is already open (do not create or close it) with these tables:
+{describe_session(session)}
+"""
+    prompt += helper_prompts(extra_files, large_files)
     try:
-        response = client.models.generate_content(
+        response = await get_genai_client().aio.models.generate_content(
             model="gemini-2.0-flash-lite",
             contents=[prompt]
         )
@@ -150,33 +246,64 @@ Do not add explanations or comments.
         return faulty_code
 
 
-async def process_task(task: list, notes: list, extra_files: list, max_retries=2) -> dict:
+async def process_task(task: list, notes: list, extra_files: list, max_retries=2, session: dict = None, large_files: list = None, step_schema=None, work_dir: str = None) -> dict:
     """
-    Runs the full cycle of generating, executing, retrying, and falling back to expected format.
+    Runs the full cycle of generating, executing, validating against the expected
+    format, retrying, and falling back to a placeholder of the expected format.
     """
     print(f"Processing task: {task}")
+    cache_key = code_cache_key(task, notes, extra_files, session, large_files)
+    cached_code = cache_get("code", cache_key)
+    if cached_code and work_dir:
+        cached_code = cached_code.replace(WORK_DIR_PLACEHOLDER, work_dir)
     try:
-        code = await generate_code(task, notes, extra_files)
+        if cached_code:
+            print("Using cached code")
+            code = cached_code
+        else:
+            code = await generate_code(task, notes, extra_files, session, large_files)
     except Exception as e:
         return {"task": task, "error": f"Code generation failed: {str(e)}"}
 
     print(f"Generated Code:\n{code}")
 
+    result = None
+    mismatched = None
     for attempt in range(max_retries):
         print(f"Attempt {attempt + 1} executing...")
-        success, result = execute_code(code)
+        success, result = await run_in_sandbox(execute_code, code, session, work_dir)
 
         if success:
-            print(f"Execution successful: {result}")
-            result = sanitize_result(result)
-            return result
+            result = coerce_to_schema(result, value_schema(step_schema, result))
+            problems = validate_result(result, step_schema)
+            if not problems:
+                print(f"Execution successful: {result}")
+                if code != cached_code:
+                    cache_set("code", cache_key, code.replace(work_dir, WORK_DIR_PLACEHOLDER) if work_dir else code)
+                return result
+
+            print(f"Result does not match expected format: {problems}")
+            mismatched = result
+            if attempt == max_retries - 1:
+                break
+            error_message = (
+                f"The code ran, but these fields of result_data are wrong: {problems}. "
+                f"Expected format: {step_schema}. Fix only these fields and keep the rest unchanged."
+            )
+        else:
+            print(f"Execution failed: {result}")
+            error_message = result
 
-        print(f"Execution failed: {result}")
         print(f"Attempt {attempt + 1} failed. Trying to fix...")
-        code = await fix_code(task, code, result, extra_files)
+        code = await fix_code(task, code, error_message, extra_files, session, large_files)
+
+    # A result that ran but didn't fully match beats a placeholder; only missing parts are filled in
+    if mismatched is not None:
+        return repair_result(mismatched, step_schema)
 
     print("Task failed after multiple attempts. Returning fallback format...")
 
-    # Fallback: infer expected format and return placeholders
-    expected_format = await infer_expected_format(task)
-    return expected_format if expected_format else {"error": "Failed to produce result"}
\ No newline at end of file
+    # Fallback: placeholder shaped like the expected format, no extra LLM call
+    if step_schema:
+        return placeholder_for(step_schema)
+    return {"error": "Failed to produce result"}
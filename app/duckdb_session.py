@@ -0,0 +1,120 @@
+import os
+import re
+from pathlib import Path
+
+SESSION_DB_NAME = "session.duckdb"
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT") or "2GB"
+
+# Readers DuckDB can scan directly. CSV/JSON are materialized into tables once
+# so later steps don't re-parse them; parquet is already columnar with
+# statistics in the footer, so a view is enough.
+TABLE_READERS = {
+    ".csv": "read_csv_auto",
+    ".tsv": "read_csv_auto",
+    ".json": "read_json_auto",
+}
+VIEW_READERS = {
+    ".parquet": "read_parquet",
+}
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def table_name_for(path, taken: set) -> str:
+    """Turn a file name into a unique, SQL-safe identifier."""
+    name = re.sub(r"\W+", "_", Path(path).stem).strip("_").lower() or "data"
+    if name[0].isdigit():
+        name = f"t_{name}"
+    candidate, i = name, 2
+    while candidate in taken:
+        candidate = f"{name}_{i}"
+        i += 1
+    return candidate
+
+
+def configure_connection(con, work_dir: str):
+    """Let DuckDB spill to the request's temp dir instead of holding everything in RAM."""
+    spill_dir = os.path.join(work_dir, "duckdb_tmp")
+    os.makedirs(spill_dir, exist_ok=True)
+    con.execute(f"SET temp_directory = {_sql_literal(spill_dir)}")
+    con.execute(f"SET memory_limit = {_sql_literal(DUCKDB_MEMORY_LIMIT)}")
+    con.execute("SET preserve_insertion_order = false")
+
+
+def create_session(work_dir: str, extra_files: list, large_files: list = None) -> dict:
+    """
+    Builds a file-backed DuckDB database in work_dir with every supported
+    upload registered once, and returns a description of what was loaded.
+    Large files are registered as views so they are streamed from disk
+    instead of being copied into the database up front.
+    The connection is closed before returning so sandboxed steps can open it.
+    """
+    import duckdb
+
+    large_files = {str(f) for f in (large_files or [])}
+    db_path = os.path.join(work_dir, SESSION_DB_NAME)
+    tables = {}
+
+    con = duckdb.connect(db_path)
+    try:
+        configure_connection(con, work_dir)
+        for file_path in extra_files:
+            suffix = Path(file_path).suffix.lower()
+            if suffix in TABLE_READERS:
+                kind = "view" if str(file_path) in large_files else "table"
+                reader = TABLE_READERS[suffix]
+            elif suffix in VIEW_READERS:
+                kind, reader = "view", VIEW_READERS[suffix]
+            else:
+                continue
+
+            name = table_name_for(file_path, set(tables))
+            try:
+                con.execute(
+                    f"CREATE {kind.upper()} {name} AS SELECT * FROM {reader}({_sql_literal(file_path)})"
+                )
+            except duckdb.Error as e:
+                print(f"DuckDB could not load {file_path}: {e}")
+                continue
+
+            columns = {row[0]: row[1] for row in con.execute(f"DESCRIBE {name}").fetchall()}
+            # Counting a view's rows would parse the whole file, so views are left uncounted
+            row_count = con.execute(f"SELECT count(*) FROM {name}").fetchone()[0] if kind == "table" else None
+            tables[name] = {
+                "kind": kind,
+                "source": str(file_path),
+                "rows": row_count,
+                "columns": columns,
+            }
+
+        if tables:
+            con.execute("ANALYZE")
+    finally:
+        con.close()
+
+    return {"db_path": db_path, "tables": tables}
+
+
+def describe_session(session: dict) -> str:
+    """Short, prompt-friendly listing of the tables in a session."""
+    lines = []
+    for name, info in session.get("tables", {}).items():
+        columns = ", ".join(f"{col} {dtype}" for col, dtype in info["columns"].items())
+        rows = f"{info['rows']} rows" if info["rows"] is not None else "row count unknown"
+        lines.append(f"{name} ({info['kind']} from {info['source']}, {rows}): {columns}")
+    return "\n".join(lines)
+
+
+def connection_preamble(session: dict) -> str:
+    """Code prepended to generated scripts so they start with an open connection `con`."""
+    work_dir = os.path.dirname(session["db_path"])
+    spill_dir = os.path.join(work_dir, "duckdb_tmp")
+    return (
+        "import duckdb\n"
+        f"con = duckdb.connect({session['db_path']!r})\n"
+        f"con.execute({'SET temp_directory = ' + _sql_literal(spill_dir)!r})\n"
+        f"con.execute({'SET memory_limit = ' + _sql_literal(DUCKDB_MEMORY_LIMIT)!r})\n"
+        "\n"
+    )
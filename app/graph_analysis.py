@@ -0,0 +1,250 @@
+# Graph metrics for edge-list uploads (e.g. network/edges.csv).
+# The edge list is parsed once into a CSR adjacency (indptr/indices arrays)
+# whose arrays are cached next to the upload, so later steps skip the CSV
+# parse. Metrics are computed with vectorized numpy instead of rebuilding a
+# networkx graph in every generated script.
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+
+from app.utils import find_edge_columns, load_cached, figure_to_base64
+
+ALL_PAIRS_MAX_NODES = 2000
+CACHE_DIR_NAME = ".graph_cache"
+
+
+def _parse_edges(path: str, source, target, directed: bool):
+    """Node labels and the deduplicated (u, v) edge arrays of an edge-list CSV."""
+    df = pd.read_csv(path, dtype=str)
+    if source is None or target is None:
+        source, target = find_edge_columns(list(df.columns)) or tuple(df.columns[:2])
+    df = df[[source, target]].dropna()
+    src = df[source].str.strip().to_numpy()
+    dst = df[target].str.strip().to_numpy()
+
+    nodes, codes = np.unique(np.concatenate([src, dst]).astype(str), return_inverse=True)
+    u, v = codes[:len(src)], codes[len(src):]
+    pairs = np.stack([u, v], axis=1) if directed else np.sort(np.stack([u, v], axis=1), axis=1)
+    pairs = np.unique(pairs.reshape(-1, 2), axis=0)
+    return nodes, pairs[:, 0], pairs[:, 1]
+
+
+def _read_graph(f) -> dict:
+    with np.load(f, allow_pickle=False) as arrays:
+        return _build_csr(arrays["nodes"], arrays["u"], arrays["v"], bool(arrays["directed"]))
+
+
+def _write_graph(graph: dict, f):
+    np.savez(f, nodes=graph["nodes"], u=graph["u"], v=graph["v"], directed=graph["directed"])
+
+
+def load_edge_list(path, source: str = None, target: str = None, directed: bool = False) -> dict:
+    """
+    Reads an edge-list CSV into a CSR graph. Duplicate edges are dropped
+    (for undirected graphs a-b and b-a are the same edge). The node labels
+    and edge arrays are cached, see load_cached.
+    """
+    kind = "directed" if directed else "undirected"
+    return load_cached(
+        path, CACHE_DIR_NAME, f"{source or 'auto'}.{target or 'auto'}.{kind}.npz",
+        parse=lambda p: _build_csr(*_parse_edges(p, source, target, directed), directed),
+        read=_read_graph,
+        write=_write_graph,
+    )
+
+
+def from_edges(edges, directed: bool = False) -> dict:
+    """Builds a CSR graph from an iterable of (source, target) pairs."""
+    edges = np.asarray(list(edges), dtype=str).reshape(-1, 2)
+    nodes, codes = np.unique(edges.ravel(), return_inverse=True)
+    pairs = codes.reshape(-1, 2)
+    if not directed:
+        pairs = np.sort(pairs, axis=1)
+    pairs = np.unique(pairs, axis=0)
+    return _build_csr(nodes, pairs[:, 0], pairs[:, 1], directed)
+
+
+def _build_csr(nodes, u, v, directed: bool) -> dict:
+    n = len(nodes)
+    heads, tails = (u, v) if directed else (np.concatenate([u, v]), np.concatenate([v, u]))
+    order = np.argsort(heads, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=indptr[1:])
+    return {
+        "nodes": nodes,
+        "index": {label: i for i, label in enumerate(nodes.tolist())},
+        "indptr": indptr,
+        "indices": tails[order],
+        "u": u,
+        "v": v,
+        "directed": directed,
+        # in + out degree; an undirected self-loop counts twice, as in networkx
+        "degrees": np.bincount(u, minlength=n) + np.bincount(v, minlength=n),
+    }
+
+
+def node_count(graph: dict) -> int:
+    return len(graph["nodes"])
+
+
+def edge_count(graph: dict) -> int:
+    return len(graph["u"])
+
+
+def degrees(graph: dict) -> dict:
+    return dict(zip(graph["nodes"].tolist(), graph["degrees"].tolist()))
+
+
+def highest_degree_node(graph: dict) -> str:
+    return str(graph["nodes"][int(np.argmax(graph["degrees"]))])
+
+
+def average_degree(graph: dict) -> float:
+    n = node_count(graph)
+    return float(graph["degrees"].sum() / n) if n else 0.0
+
+
+def density(graph: dict) -> float:
+    n = node_count(graph)
+    if n < 2:
+        return 0.0
+    possible = n * (n - 1) if graph["directed"] else n * (n - 1) / 2
+    return float(edge_count(graph) / possible)
+
+
+def _bfs(graph: dict, source: int):
+    """Level-synchronous BFS; each level is expanded with array operations."""
+    indptr, indices = graph["indptr"], graph["indices"]
+    n = len(indptr) - 1
+    dist = np.full(n, -1, dtype=np.int64)
+    parent = np.full(n, -1, dtype=np.int64)
+    dist[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    level = 0
+    while frontier.size:
+        level += 1
+        starts, lens = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+        total = int(lens.sum())
+        if total == 0:
+            break
+        offsets = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(total)
+        neighbours = indices[offsets]
+        owners = np.repeat(frontier, lens)
+        unseen = dist[neighbours] < 0
+        neighbours, first = np.unique(neighbours[unseen], return_index=True)
+        dist[neighbours] = level
+        parent[neighbours] = owners[unseen][first]
+        frontier = neighbours
+    return dist, parent
+
+
+def _node_id(graph: dict, label) -> int:
+    try:
+        return graph["index"][str(label)]
+    except KeyError:
+        raise KeyError(f"Node {label!r} is not in the graph") from None
+
+
+def shortest_path_length(graph: dict, source, target):
+    """Number of edges on the shortest path, or None if target is unreachable."""
+    dist, _ = _bfs(graph, _node_id(graph, source))
+    d = int(dist[_node_id(graph, target)])
+    return d if d >= 0 else None
+
+
+def shortest_path(graph: dict, source, target) -> list:
+    """Node labels along one shortest path, or [] if target is unreachable."""
+    s, t = _node_id(graph, source), _node_id(graph, target)
+    dist, parent = _bfs(graph, s)
+    if dist[t] < 0:
+        return []
+    path = [t]
+    while path[-1] != s:
+        path.append(int(parent[path[-1]]))
+    return [str(graph["nodes"][i]) for i in reversed(path)]
+
+
+def distance_matrix(graph: dict) -> np.ndarray:
+    """All-pairs hop distances (-1 = unreachable), one BFS per node."""
+    return np.stack([_bfs(graph, i)[0] for i in range(node_count(graph))])
+
+
+def connected_components(graph: dict) -> list:
+    """Weakly connected components as lists of node labels, largest first."""
+    undirected = graph if not graph["directed"] else _build_csr(graph["nodes"], graph["u"], graph["v"], False)
+    label = np.full(node_count(graph), -1, dtype=np.int64)
+    components = []
+    for start in range(node_count(graph)):
+        if label[start] >= 0:
+            continue
+        members = np.flatnonzero(_bfs(undirected, start)[0] >= 0)
+        label[members] = len(components)
+        components.append([str(graph["nodes"][i]) for i in members])
+    return sorted(components, key=len, reverse=True)
+
+
+def graph_summary(graph: dict) -> dict:
+    """The common metrics in one call."""
+    summary = {
+        "node_count": node_count(graph),
+        "edge_count": edge_count(graph),
+        "highest_degree_node": highest_degree_node(graph) if node_count(graph) else None,
+        "average_degree": average_degree(graph),
+        "density": density(graph),
+        "degrees": degrees(graph),
+        "connected_components": len(connected_components(graph)),
+    }
+    # All-pairs BFS is quadratic, so path statistics are only added for modest graphs
+    if (summary["connected_components"] == 1 and not graph["directed"]
+            and 1 < node_count(graph) <= ALL_PAIRS_MAX_NODES):
+        dist = distance_matrix(graph)
+        off_diagonal = dist[~np.eye(len(dist), dtype=bool)]
+        summary["diameter"] = int(off_diagonal.max())
+        summary["average_shortest_path_length"] = float(off_diagonal.mean())
+    return summary
+
+
+def _layout(graph: dict) -> np.ndarray:
+    n = node_count(graph)
+    try:
+        import networkx as nx
+
+        g = nx.Graph()
+        g.add_nodes_from(range(n))
+        g.add_edges_from(zip(graph["u"].tolist(), graph["v"].tolist()))
+        pos = nx.spring_layout(g, seed=42)
+        return np.array([pos[i] for i in range(n)])
+    except ImportError:
+        angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+        return np.column_stack([np.cos(angles), np.sin(angles)])
+
+
+def network_graph_png(graph: dict, node_color: str = "skyblue", edge_color: str = "gray",
+                      with_labels: bool = True, max_bytes: int = 100_000) -> str:
+    """Draws the network with labelled nodes and returns a base64 PNG."""
+    pos = _layout(graph)
+    fig, ax = plt.subplots(figsize=(6, 6))
+    segments = np.stack([pos[graph["u"]], pos[graph["v"]]], axis=1)
+    ax.add_collection(LineCollection(segments, colors=edge_color, linewidths=1, zorder=1))
+    ax.scatter(pos[:, 0], pos[:, 1], s=600, c=node_color, edgecolors="black", zorder=2)
+    if with_labels:
+        for (x, y), label in zip(pos, graph["nodes"].tolist()):
+            ax.annotate(str(label), (x, y), ha="center", va="center", fontsize=9, zorder=3)
+    ax.set_axis_off()
+    ax.margins(0.15)
+    return figure_to_base64(fig, max_bytes=max_bytes)
+
+
+def degree_histogram_png(graph: dict, color: str = "green", max_bytes: int = 100_000) -> str:
+    """Bar chart of how many nodes have each degree, as a base64 PNG."""
+    counts = np.bincount(graph["degrees"])
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.bar(np.arange(len(counts)), counts, color=color)
+    ax.set_xlabel("Degree")
+    ax.set_ylabel("Number of nodes")
+    ax.set_title("Degree distribution")
+    ax.set_xticks(np.arange(len(counts)))
+    return figure_to_base64(fig, max_bytes=max_bytes)
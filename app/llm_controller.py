@@ -1,11 +1,12 @@
 import os
-from google import genai
 from dotenv import load_dotenv
+from app.llm_utils import get_genai_client
 import re
 import json
+from app.schema import question_fingerprint
+from app.shared_cache import cache_get, cache_set
 
 load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 def extract_json_from_response(response_text: str):
     """Extract JSON from LLM text output, removing code fences if present."""
@@ -53,7 +54,7 @@ Task:
 """
 
     try:
-        response = client.models.generate_content(
+        response = await get_genai_client().aio.models.generate_content(
             model="gemini-2.0-flash-lite",
             contents=[prompt]
         )
@@ -61,8 +62,24 @@ Task:
     except Exception as e:
         print(f"Expected format inference failed: {e}")
         return {}
+
+async def get_expected_format(question: str):
+    """
+    Infers the expected output template once per question and caches it,
+    so it can be requested alongside the breakdown and reused by every step.
+    Cached across worker processes, keyed by question fingerprint.
+    """
+    key = question_fingerprint(question)
+    cached = cache_get("expected_format", key)
+    if cached:
+        return cached
+
+    expected_format = await infer_expected_format(question)
+    if expected_format:
+        cache_set("expected_format", key, expected_format)
+    return expected_format
     
-async def breakdown_question(question: str):
+async def breakdown_question(question: str, work_dir: str = None):
     prompt = '''You are a data analyst agent. Your job is to break down the given task into smaller, clear, programmable steps.
 
 Rules:
@@ -100,9 +117,15 @@ Rules:
 Now, break down the following task:
 [TASK GOES HERE]'''
 
+    key = question_fingerprint(question)
+    cached = cache_get("breakdown", key)
+    if cached:
+        print("Using cached breakdown")
+        return cached
+
     try:
         # Send prompt and question to LLM
-        response = client.models.generate_content(
+        response = await get_genai_client().aio.models.generate_content(
             model="gemini-2.0-flash-lite",
             contents=[prompt, question]
         )
@@ -117,8 +140,13 @@ Now, break down the following task:
         if "final_answer_steps" not in parsed or not parsed["final_answer_steps"]:
             parsed["final_answer_steps"] = infer_final_answer_steps(parsed.get("steps", []))
 
-        with open("task_broken.json", "w") as f:
-            json.dump(parsed, f, indent=2)
+        # Debug dump, kept inside the request's own directory
+        if work_dir:
+            with open(os.path.join(work_dir, "task_broken.json"), "w") as f:
+                json.dump(parsed, f, indent=2)
+
+        if parsed.get("steps"):
+            cache_set("breakdown", key, parsed)
 
         return parsed
 
@@ -130,44 +158,3 @@ Now, break down the following task:
             "notes": [],
             "final_answer_steps": []
         }
-    
-async def get_dummy_guess(task_details: str):
-    """
-    Ask the LLM to make a quick guess for a failed step without explanations.
-    Returns only the guessed value.
-    """
-    prompt = f'''This task failed to execute successfully:
-    {task_details}
-
-    Make your best guess of the answer.
-    Rules:
-    - Do not explain your reasoning.
-    - Return only the guessed value.
-    - If the answer is numeric, return it as a number, not as a string.
-    - If the answer is a string, return it as a plain string.
-    - Do not add any extra quotes or backslashes or Markdown of any kind.
-
-    Examples:
-    42
-    "Maharashtra"
-    3.14
-    True
-    '''
-
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
-            contents=[prompt]
-        )
-        guess_text = response.text.strip()
-
-        # Try to parse if it's valid JSON, else return raw text
-        try:
-            parsed_guess = json.loads(guess_text)
-            return parsed_guess
-        except json.JSONDecodeError:
-            return guess_text
-
-    except Exception as e:
-        print(f"Dummy guess generation error: {e}")
-        return None
\ No newline at end of file
@@ -1,9 +1,7 @@
 import os
 import re
 import json
-import httpx # pyright: ignore
 from dotenv import load_dotenv
-from google import genai
 
 load_dotenv()
 
@@ -12,7 +10,22 @@ GENAI_API_KEY = os.getenv("GEMINI_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 AIPIPE_TOKEN = os.getenv("AIPIPE_TOKEN")
 
-genai.configure(api_key=GENAI_API_KEY)
+DEFAULT_GEMINI_MODEL = "gemini-2.0-flash-lite"
+
+_genai_client = None
+
+
+def get_genai_client():
+    """
+    Shared Gemini client, created on first use so importing the API
+    doesn't pay for google.genai until an LLM call is actually made.
+    """
+    global _genai_client
+    if _genai_client is None:
+        from google import genai
+
+        _genai_client = genai.Client(api_key=GENAI_API_KEY)
+    return _genai_client
 
 
 def extract_json_from_response(response_text: str):
@@ -27,12 +40,16 @@ def extract_json_from_response(response_text: str):
 async def call_llm(prompt: str, provider: str = MODEL_PROVIDER, model: str = None) -> str:
     try:
         if provider == "gemini":
-            model = model or "models/gemini-pro"
-            chat = genai.GenerativeModel(model).start_chat()
-            response = chat.send_message(prompt)
+            model = model or DEFAULT_GEMINI_MODEL
+            response = await get_genai_client().aio.models.generate_content(
+                model=model,
+                contents=[prompt]
+            )
             return response.text
 
-        elif provider == "openai":
+        import httpx # pyright: ignore
+
+        if provider == "openai":
             model = model or "gpt-4o"
             headers = {
                 "Authorization": f"Bearer {OPENAI_API_KEY}",
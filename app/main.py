@@ -1,37 +1,34 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request # pyright: ignore[reportMissingImports]
-from fastapi.responses import JSONResponse # pyright: ignore[reportMissingImports]
+from fastapi.responses import JSONResponse, Response # pyright: ignore[reportMissingImports]
 import os
+import asyncio
 from pathlib import Path
-from app.llm_controller import breakdown_question
+from app.llm_controller import breakdown_question, get_expected_format
 from app.code_executor import process_task
 from dotenv import load_dotenv
 import traceback
-import json
-from app.llm_controller import get_dummy_guess
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from app.duckdb_session import create_session
+from app.result_codec import encode_result
+from app.schema import schema_for_step, placeholder_for
+from app.serving import worker_dir, pin_web_worker
 
 load_dotenv()
 
-app = FastAPI()
+# Uploads at or above this size switch code generation to streaming/chunked mode
+LARGE_FILE_THRESHOLD_MB = float(os.getenv("LARGE_FILE_THRESHOLD_MB") or "200")
 
-def cast_answer(value):
-    """Convert strings that represent numbers into int/float, else return as-is."""
-    if isinstance(value, str):
-        try:
-            return int(value) if value.isdigit() else float(value)
-        except ValueError:
-            # Remove quotes and backslashes if it's a string
-            return value
-    elif isinstance(value, list):
-        return [cast_answer(v) for v in value]
-    elif isinstance(value, dict):
-        return {k: cast_answer(v) for k, v in value.items()}
-    return value
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pin_web_worker()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/api/")
 async def analyze_data(request : Request):
-    UPLOAD_DIR = Path("uploads")
-    UPLOAD_DIR.mkdir(exist_ok=True)
-
     form = await request.form()
 
     if "questions.txt" not in form and "question.txt" not in form:
@@ -45,23 +42,49 @@ async def analyze_data(request : Request):
     if not question_file.filename.endswith(".txt"):
         raise HTTPException(status_code=400, detail="Please upload a .txt file for questions.txt.")
     
+    work_dir = None
     try:
         # Read question text
         question_text = (await question_file.read()).decode('utf-8')
 
+        # Each request gets its own directory inside this worker's directory
+        work_dir = tempfile.mkdtemp(prefix="request-", dir=worker_dir())
+        UPLOAD_DIR = Path(work_dir) / "uploads"
+        UPLOAD_DIR.mkdir()
+
         extra_files = []
         # Collect all other files into a list
         for field_name, value in form.items():
             if hasattr(value, "filename") and value.filename:
                 file_path = UPLOAD_DIR / value.filename
+                # Streamed to disk in blocks so large uploads never sit in the web worker's memory
                 with open(file_path, "wb") as f:
-                    f.write(await value.read())
+                    await asyncio.to_thread(shutil.copyfileobj, value.file, f, 1024 * 1024)
                 extra_files.append(file_path)
 
         print(f"Saved extra files: {extra_files}")
 
-        # Step 1: Get breakdown from LLM
-        breakdown = await breakdown_question(question_text)
+        large_files = [
+            str(f) for f in extra_files
+            if os.path.getsize(f) >= LARGE_FILE_THRESHOLD_MB * 1024 * 1024
+        ]
+        if large_files:
+            print(f"Large-file mode enabled for: {large_files}")
+
+        # Load uploads into a per-request DuckDB database shared by all steps
+        try:
+            session = await asyncio.to_thread(create_session, work_dir, extra_files, large_files)
+            print(f"DuckDB session tables: {list(session['tables'])}")
+        except Exception as session_err:
+            print(f"DuckDB session setup failed: {session_err}")
+            session = None
+
+        # Step 1: Get breakdown and expected output format from LLM in parallel
+        breakdown, expected_format = await asyncio.gather(
+            breakdown_question(question_text, work_dir),
+            get_expected_format(question_text)
+        )
+        print(f"Expected format: {expected_format}")
         steps = breakdown.get("steps", [])
         notes = breakdown.get("notes", [])
         final_steps = breakdown.get("final_answer_steps", [])
@@ -73,21 +96,31 @@ async def analyze_data(request : Request):
             step_num = step.get("step_number")
             details = step.get("details", "")
             print(f"Executing step {step_num}: {details}")
+            # Only final answers are checked against the expected format;
+            # the i-th final step produces the i-th answer
+            step_schema = None
+            if step_num in final_steps:
+                step_schema = schema_for_step(expected_format, details, answer_index=len(results))
             try:
-                result = await process_task(details, notes, extra_files)
+                result = await process_task(
+                    details, notes, extra_files,
+                    session=session, large_files=large_files, step_schema=step_schema,
+                    work_dir=work_dir
+                )
                 if step_num in final_steps:
                     print(f"Appending actual result for step {step_num}")
                     results.append(result)
             except Exception as task_err:
                 print(f"Step {step_num} failed: {task_err}")
                 if step_num in final_steps:
-                    dummy_guess = await get_dummy_guess(details)
-                    print(f"Appending dummy guess for step {step_num}")
-                    #results.append(cast_answer(dummy_guess))
-                    results.append(dummy_guess)
+                    print(f"Appending placeholder for step {step_num}")
+                    if step_schema is not None:
+                        results.append(placeholder_for(step_schema))
+                    else:
+                        results.append({"error": f"Step {step_num} failed: {task_err}"})
         # Cast results to ensure correct types
             print(f"Result {step_num} : {results}")
-        return json.dumps(results)
+        return Response(content=encode_result(results), media_type="application/json")
 
     except Exception as e:
         print(f"API Error: {e}")
@@ -96,6 +129,9 @@ async def analyze_data(request : Request):
             "results": [],
             "error": str(e)
         }
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,133 @@
+import base64
+import datetime
+import decimal
+import json
+import math
+
+from app.schema import template_kind
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+if orjson:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Convert values the encoder doesn't know natively. Only touches pandas if the value is from pandas."""
+    module = type(obj).__module__.split(".")[0]
+
+    if module == "pandas":
+        import pandas as pd  # already loaded, since obj came from it
+
+        if pd.api.types.is_scalar(obj) and pd.isna(obj):
+            return None  # pd.NA / pd.NaT
+        if isinstance(obj, pd.DataFrame):
+            # keep a meaningful index (dates, group keys) as columns; leftover row numbers are dropped
+            unnamed_positions = obj.index.names == [None] and pd.api.types.is_integer_dtype(obj.index)
+            if not unnamed_positions:
+                obj = obj.reset_index(allow_duplicates=True)
+            return [{_key(k): v for k, v in row.items()} for row in obj.to_dict(orient="records")]
+        if isinstance(obj, pd.Series):
+            # keep the index as keys, e.g. value_counts() or groupby results
+            return {_key(k): v for k, v in obj.to_dict().items()}
+        if hasattr(obj, "tolist"):
+            return obj.tolist()
+        if hasattr(obj, "isoformat"):
+            return obj.isoformat()
+    if module == "numpy" and hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode("ascii")
+    return str(obj)
+
+
+def _key(key):
+    """Dict keys the encoders accept: str/int/float/bool stay, the rest becomes text."""
+    if key is None or isinstance(key, (str, int, float, bool)):
+        return key
+    if hasattr(key, "item"):  # numpy scalar
+        return key.item()
+    if hasattr(key, "isoformat"):
+        return key.isoformat()
+    return str(key)
+
+
+def encode_result(obj) -> bytes:
+    """
+    Serialize a result to JSON bytes in a single pass. Values orjson rejects
+    (e.g. Timestamp or tuple dict keys, ints wider than 64 bits) go through
+    the stdlib encoder with the keys normalized instead.
+    """
+    if orjson:
+        try:
+            return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(
+        _normalize(obj), default=lambda o: _normalize(_default(o)), separators=(",", ":")
+    ).encode("utf-8")
+
+
+def decode_result(data: bytes):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _normalize(obj):
+    # orjson writes NaN/Infinity as null; match that so the fallback emits valid JSON too
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    if isinstance(obj, (list, tuple)):
+        return [_normalize(v) for v in obj]
+    if isinstance(obj, dict):
+        return {_key(k): _normalize(v) for k, v in obj.items()}
+    return obj
+
+
+def _to_number(value: str, integer: bool):
+    text = value.strip().replace(",", "")
+    try:
+        number = float(text)
+    except ValueError:
+        return value
+    if integer and number.is_integer():
+        return int(number)
+    return number
+
+
+def coerce_to_schema(value, template):
+    """
+    Coerce a decoded result to the types of an expected-output template,
+    e.g. "12.5" -> 12.5 where the template has a number (sample value or a
+    type name like "number"). Only text is converted; numbers are never
+    turned into strings, and values that don't fit are returned unchanged.
+    """
+    if template is None or value is None:
+        return value
+    if isinstance(template, dict):
+        if isinstance(value, dict):
+            return {k: coerce_to_schema(v, template.get(k)) for k, v in value.items()}
+        return value
+    if isinstance(template, list):
+        if isinstance(value, list):
+            item_template = template[0] if template else None
+            return [coerce_to_schema(v, item_template) for v in value]
+        return value
+    if not isinstance(value, str):
+        return value
+    kind = template_kind(template)
+    if kind == "boolean" and value.strip().lower() in {"true", "false"}:
+        return value.strip().lower() == "true"
+    if kind in ("number", "integer"):
+        return _to_number(value, kind == "integer")
+    return value
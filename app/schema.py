@@ -0,0 +1,171 @@
+import hashlib
+import math
+import re
+
+
+def question_fingerprint(question: str) -> str:
+    """Stable cache key for a question, insensitive to case and whitespace."""
+    normalized = " ".join(question.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def schema_for_step(template, task, answer_index: int = None):
+    """
+    Picks the part of the expected-output template a final-answer step is
+    responsible for: the top-level keys its details mention for an object
+    template, or the element at answer_index (its position among the final
+    answers) for an array template. Returns None when the step doesn't map
+    to any part, so it isn't validated.
+    """
+    if not template:
+        return None
+    if isinstance(template, list):
+        if answer_index is not None and answer_index < len(template):
+            return template[answer_index]
+        return None
+    if not isinstance(template, dict):
+        return template
+    text = " ".join(task) if isinstance(task, list) else str(task)
+    mentioned = {
+        key: value for key, value in template.items()
+        if re.search(rf"(?<!\w){re.escape(str(key))}(?!\w)", text)
+    }
+    return mentioned or None
+
+
+def value_schema(schema, result):
+    """A single-key step schema also accepts a bare value instead of {key: value}."""
+    if isinstance(schema, dict) and len(schema) == 1 and not isinstance(result, dict):
+        return next(iter(schema.values()))
+    return schema
+
+
+# Inferred templates often spell the type out ("number", "<number>", "float value")
+# instead of giving a sample value
+TYPE_NAMES = {
+    "number": "number", "float": "number", "double": "number", "decimal": "number", "numeric": "number",
+    "int": "integer", "integer": "integer",
+    "bool": "boolean", "boolean": "boolean",
+    "string": "string", "str": "string", "text": "string",
+}
+TYPE_FILLER_WORDS = {"a", "an", "the", "value", "type", "or"}
+NUMBER_PATTERN = re.compile(r"[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?")
+
+
+def template_kind(template):
+    """
+    Scalar kind a template asks for: "number", "integer", "boolean" or
+    "string". A string template only names a type when it is a number
+    ("0.48"), "true"/"false" or made of type names ("<number>",
+    "number (float)"); other free text is a sample or a description and
+    leaves the value unconstrained (None), except base64 image templates,
+    which must be strings.
+    """
+    if isinstance(template, bool):
+        return "boolean"
+    if isinstance(template, (int, float)):
+        return "number"
+    if not isinstance(template, str):
+        return None
+    text = template.strip().lower()
+    if NUMBER_PATTERN.fullmatch(text.replace(",", "")):
+        return "number"
+    if text in ("true", "false"):
+        return "boolean"
+    words = re.findall(r"[a-z]+", text)
+    kinds = {TYPE_NAMES[w] for w in words if w in TYPE_NAMES}
+    if kinds and all(w in TYPE_NAMES or w in TYPE_FILLER_WORDS for w in words):
+        if kinds <= {"number", "integer"}:
+            return "integer" if kinds == {"integer"} else "number"
+        if len(kinds) == 1:
+            return kinds.pop()
+    if "base64" in text:
+        return "string"
+    return None
+
+
+def _check(value, template, path: str) -> list:
+    label = path or "result_data"
+    if template is None:
+        return []
+    if isinstance(template, dict):
+        if not isinstance(value, dict):
+            return [f"{label}: expected an object"]
+        problems = []
+        for key, sub_template in template.items():
+            sub_path = f"{path}.{key}" if path else str(key)
+            if key not in value:
+                problems.append(f"{sub_path}: missing")
+            else:
+                problems += _check(value[key], sub_template, sub_path)
+        return problems
+    if isinstance(template, list):
+        if not isinstance(value, list):
+            return [f"{label}: expected a list"]
+        if template:
+            problems = []
+            for i, item in enumerate(value):
+                problems += _check(item, template[0], f"{label}[{i}]")
+            return problems
+        return []
+    kind = template_kind(template)
+    if kind == "boolean":
+        return [] if isinstance(value, bool) else [f"{label}: expected a boolean"]
+    if kind in ("number", "integer"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return [f"{label}: expected a number"]
+        if kind == "integer" and not float(value).is_integer():
+            return [f"{label}: expected an integer"]
+        return []
+    if kind == "string":
+        if not isinstance(value, str):
+            return [f"{label}: expected a string"]
+        if "base64" in template.lower() and not value.strip():
+            return [f"{label}: expected a non-empty base64 string"]
+        return []
+    return []
+
+
+def validate_result(result, schema) -> list:
+    """Returns a list of problems (empty if the result matches the schema)."""
+    if schema is None:
+        return []
+    return _check(result, value_schema(schema, result), "")
+
+
+def placeholder_for(template):
+    """Schema-shaped neutral value, used instead of asking the LLM for a guess."""
+    if isinstance(template, dict):
+        return {key: placeholder_for(value) for key, value in template.items()}
+    if isinstance(template, list):
+        return []
+    kind = template_kind(template)
+    if kind == "boolean":
+        return False
+    if kind in ("number", "integer"):
+        return 0
+    if kind == "string":
+        return ""
+    return None
+
+
+def _repair(value, template):
+    if isinstance(template, dict):
+        if not isinstance(value, dict):
+            return placeholder_for(template)
+        repaired = dict(value)
+        for key, sub_template in template.items():
+            repaired[key] = _repair(value[key], sub_template) if key in value else placeholder_for(sub_template)
+        return repaired
+    if isinstance(template, list):
+        return value if isinstance(value, list) else placeholder_for(template)
+    # A scalar of the wrong type is still the computed answer; a placeholder would only hide it
+    return value
+
+
+def repair_result(result, schema):
+    """
+    Fills in missing fields and wrong containers with placeholders, keeping
+    every computed value, including scalars whose type doesn't match.
+    """
+    return _repair(result, value_schema(schema, result))
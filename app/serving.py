@@ -0,0 +1,115 @@
+# Multi-process serving: per-worker working directories, the CPU split between
+# web workers and sandbox executors, and an entry point that starts uvicorn
+# with several workers (python -m app.serving).
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Empty values (e.g. copied from .env.example) count as unset
+WORK_ROOT = Path(os.getenv("WORK_ROOT") or "uploads")
+WEB_WORKERS = max(1, int(os.getenv("WEB_WORKERS") or "1"))
+
+_sandbox_semaphore = None
+
+
+def worker_dir() -> Path:
+    """Working directory private to this worker process."""
+    path = (WORK_ROOT / f"worker-{os.getpid()}").resolve()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _available_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_split():
+    """
+    Splits the available cores into (web_cpus, sandbox_cpus). The first
+    WEB_WORKERS cores serve HTTP and the rest run sandboxed scripts;
+    SANDBOX_CPUS overrides the sandbox share (e.g. "2-7" or "2,3,4").
+    When there are too few cores to split, both sides share all of them.
+    """
+    cpus = _available_cpus()
+    configured = os.getenv("SANDBOX_CPUS")
+    if configured:
+        sandbox = set()
+        for part in configured.split(","):
+            if "-" in part:
+                start, end = part.split("-")
+                sandbox.update(range(int(start), int(end) + 1))
+            elif part.strip():
+                sandbox.add(int(part))
+        sandbox = sorted(sandbox & set(cpus)) or cpus
+        web = [c for c in cpus if c not in sandbox] or cpus
+        return web, sandbox
+    if len(cpus) <= WEB_WORKERS:
+        return cpus, cpus
+    return cpus[:WEB_WORKERS], cpus[WEB_WORKERS:]
+
+
+WEB_CPUS, SANDBOX_CPUS = cpu_split()
+# Only pin processes in multi-worker mode or when the split is configured explicitly;
+# a plain single-process run keeps every core available
+PIN_CPUS = (WEB_WORKERS > 1 or bool(os.getenv("SANDBOX_CPUS"))) and WEB_CPUS != SANDBOX_CPUS
+# Concurrent sandbox scripts per web worker, so all workers together fill the sandbox cores
+SANDBOX_SLOTS = max(1, int(os.getenv("SANDBOX_SLOTS") or max(1, len(SANDBOX_CPUS) // WEB_WORKERS)))
+
+
+def pin_web_worker():
+    """Restricts the current (web) process to the web cores, where supported."""
+    if hasattr(os, "sched_setaffinity") and PIN_CPUS:
+        try:
+            os.sched_setaffinity(0, WEB_CPUS)
+        except OSError as e:
+            print(f"Could not pin web worker: {e}")
+
+
+def sandbox_env(env: dict) -> dict:
+    """Caps native thread pools in a sandboxed script to its share of the sandbox cores."""
+    threads = str(max(1, len(SANDBOX_CPUS) // max(1, SANDBOX_SLOTS)))
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"):
+        env.setdefault(name, threads)
+    return env
+
+
+def sandbox_affinity_preamble() -> str:
+    """Script lines that move a sandboxed process onto the sandbox cores."""
+    if not hasattr(os, "sched_setaffinity") or not PIN_CPUS:
+        return ""
+    return (
+        "try:\n"
+        f"    _os.sched_setaffinity(0, {set(SANDBOX_CPUS)!r})\n"
+        "except OSError:\n"
+        "    pass\n"
+    )
+
+
+async def run_in_sandbox(func, *args):
+    """Runs a blocking sandbox call in a thread, at most SANDBOX_SLOTS at a time per worker."""
+    global _sandbox_semaphore
+    if _sandbox_semaphore is None:
+        _sandbox_semaphore = asyncio.Semaphore(SANDBOX_SLOTS)
+    async with _sandbox_semaphore:
+        return await asyncio.to_thread(func, *args)
+
+
+def main():
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST") or "0.0.0.0",
+        port=int(os.getenv("PORT") or "8000"),
+        workers=WEB_WORKERS,
+    )
+
+
+if __name__ == "__main__":
+    main()
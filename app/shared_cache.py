@@ -0,0 +1,72 @@
+# Cross-process cache for LLM output (breakdowns, expected formats, generated code).
+# Backed by a local SQLite file in WAL mode so every uvicorn/gunicorn worker on
+# the machine shares it; reads go through SQLite's memory-mapped I/O.
+import os
+import sqlite3
+import time
+
+from app.result_codec import encode_result, decode_result
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(".cache", "shared_cache.sqlite3"))
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL") or 7 * 24 * 3600)
+MMAP_SIZE = 64 * 1024 * 1024
+
+_connection = None
+_connection_pid = None
+
+
+def _connect():
+    """One connection per process; reopened after a fork."""
+    global _connection, _connection_pid
+    if _connection is not None and _connection_pid == os.getpid():
+        return _connection
+
+    directory = os.path.dirname(SHARED_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    con = sqlite3.connect(SHARED_CACHE_PATH, timeout=10, isolation_level=None, check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS cache ("
+        " namespace TEXT NOT NULL,"
+        " key TEXT NOT NULL,"
+        " value BLOB NOT NULL,"
+        " created REAL NOT NULL,"
+        " PRIMARY KEY (namespace, key))"
+    )
+    _connection, _connection_pid = con, os.getpid()
+    return con
+
+
+def cache_get(namespace: str, key: str):
+    """Returns the cached value, or None if missing, expired or the cache is disabled."""
+    if not SHARED_CACHE_PATH:
+        return None
+    try:
+        row = _connect().execute(
+            "SELECT value, created FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Shared cache read failed: {e}")
+        return None
+    if row is None or time.time() - row[1] > SHARED_CACHE_TTL:
+        return None
+    try:
+        return decode_result(row[0])
+    except ValueError as e:  # corrupt or truncated row; the next cache_set overwrites it
+        print(f"Shared cache entry {namespace}/{key} is unreadable: {e}")
+        return None
+
+
+def cache_set(namespace: str, key: str, value):
+    if not SHARED_CACHE_PATH or value is None:
+        return
+    try:
+        _connect().execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+            (namespace, key, encode_result(value), time.time())
+        )
+    except sqlite3.Error as e:
+        print(f"Shared cache write failed: {e}")
@@ -0,0 +1,181 @@
+# Time-series helpers for date-keyed uploads (e.g. the weather and sales samples).
+# The date column is parsed once into a sorted, typed frame indexed by date,
+# which is cached as parquet next to the upload so later steps skip the CSV parse.
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from app.utils import (
+    read_csv_sample, find_date_column, looks_like_dates, load_cached, figure_to_base64,
+    DATE_SAMPLE_ROWS, DATE_MIN_PARSED_RATIO,
+)
+
+CACHE_DIR_NAME = ".timeseries_cache"
+CATEGORY_MAX_RATIO = 0.5
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _parse(path: str, date_column=None) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    if date_column is None:
+        # Same sample as detect_date_files, so a file flagged there always loads here
+        date_column = find_date_column(*read_csv_sample(path))
+    if date_column is None:
+        raise ValueError(f"No date column found in {path}")
+    if not _is_text(df[date_column]):
+        raise ValueError(f"Column {date_column!r} in {path} is {df[date_column].dtype}, not dates")
+    if not looks_like_dates(df[date_column].dropna().head(DATE_SAMPLE_ROWS).tolist()):
+        raise ValueError(f"Column {date_column!r} in {path} does not hold calendar dates")
+
+    present = df[date_column].notna()
+    parsed = pd.to_datetime(df[date_column], errors="coerce")
+    unparsed = int((parsed.isna() & present).sum())
+    if unparsed:
+        # the format is inferred from the first value; retry element-wise for mixed formats
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(df[date_column], errors="coerce", format="mixed")
+        unparsed = int((parsed.isna() & present).sum())
+    if unparsed > (1 - DATE_MIN_PARSED_RATIO) * max(int(present.sum()), 1):
+        raise ValueError(
+            f"{unparsed} of {int(present.sum())} values in {date_column!r} are not dates; "
+            "load this file with pandas instead"
+        )
+    df[date_column] = parsed
+    df = df.dropna(subset=[date_column]).sort_values(date_column, kind="stable")
+    df = df.set_index(date_column)
+
+    for col in df.columns:
+        if _is_text(df[col]):
+            numeric = pd.to_numeric(df[col], errors="coerce")
+            if numeric.notna().sum() == df[col].notna().sum():
+                df[col] = numeric
+            elif df[col].nunique() <= CATEGORY_MAX_RATIO * len(df):
+                df[col] = df[col].astype("category")
+    return df
+
+
+def load_timeseries(path, date_column: str = None) -> pd.DataFrame:
+    """
+    Returns the CSV as a DataFrame with a sorted DatetimeIndex and typed
+    columns. The parsed frame is cached, see load_cached.
+    """
+    return load_cached(
+        path, CACHE_DIR_NAME, f"{date_column or 'auto'}.parquet",
+        parse=lambda p: _parse(p, date_column),
+        read=pd.read_parquet,
+        write=lambda frame, f: frame.to_parquet(f),
+    )
+
+
+def calendar_feature(frame: pd.DataFrame, name: str) -> pd.Series:
+    """Derived date parts: day_of_month, day_of_week, day_of_year, week, month, quarter, year."""
+    index = frame.index
+    features = {
+        "day": index.day,
+        "day_of_month": index.day,
+        "day_of_week": index.dayofweek,
+        "weekday": index.dayofweek,
+        "day_of_year": index.dayofyear,
+        "week": index.isocalendar().week.to_numpy(),
+        "month": index.month,
+        "quarter": index.quarter,
+        "year": index.year,
+    }
+    if name not in features:
+        raise KeyError(f"Unknown calendar feature {name!r}; choose from {sorted(features)}")
+    return pd.Series(np.asarray(features[name], dtype="int64"), index=index, name=name)
+
+
+def _series(frame: pd.DataFrame, column: str) -> pd.Series:
+    if column in frame.columns:
+        return frame[column]
+    return calendar_feature(frame, column)
+
+
+def correlation(frame: pd.DataFrame, a: str, b: str, method: str = "pearson") -> float:
+    """Correlation between two columns; either may be a calendar feature such as "day_of_month"."""
+    return float(_series(frame, a).corr(_series(frame, b), method=method))
+
+
+def rolling(frame: pd.DataFrame, column: str, window, how: str = "mean") -> pd.Series:
+    """Rolling aggregate; window is a row count (7) or a time span ("7D")."""
+    return getattr(frame[column].rolling(window), how)()
+
+
+def cumulative(frame: pd.DataFrame, column: str, how: str = "sum") -> pd.Series:
+    """Running sum/max/min/prod over time."""
+    return getattr(frame[column], f"cum{how}")()
+
+
+def resample(frame: pd.DataFrame, column: str, rule: str = "D", how: str = "sum") -> pd.Series:
+    """Aggregate to a regular frequency, e.g. rule="W" with how="mean"."""
+    return getattr(frame[column].resample(rule), how)()
+
+
+def date_of_max(frame: pd.DataFrame, column: str) -> str:
+    return _format_date(frame[column].idxmax())
+
+
+def date_of_min(frame: pd.DataFrame, column: str) -> str:
+    return _format_date(frame[column].idxmin())
+
+
+def _format_date(ts: pd.Timestamp) -> str:
+    return ts.date().isoformat() if ts == ts.normalize() else ts.isoformat()
+
+
+def summary(frame: pd.DataFrame, column: str) -> dict:
+    values = frame[column]
+    return {
+        "count": int(values.count()),
+        "sum": float(values.sum()),
+        "mean": float(values.mean()),
+        "median": float(values.median()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "date_of_max": date_of_max(frame, column),
+        "date_of_min": date_of_min(frame, column),
+    }
+
+
+def line_chart_png(series: pd.Series, color: str = "red", title: str = None, ylabel: str = None,
+                   max_bytes: int = 100_000) -> str:
+    """Line chart of a date-indexed series (e.g. frame["sales"] or cumulative(frame, "sales"))."""
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.plot(series.index, series.to_numpy(), color=color)
+    ax.set_xlabel(series.index.name or "date")
+    ax.set_ylabel(ylabel or series.name or "")
+    if title:
+        ax.set_title(title)
+    fig.autofmt_xdate()
+    return figure_to_base64(fig, max_bytes=max_bytes)
+
+
+def bar_chart_png(series: pd.Series, color: str = "blue", title: str = None, ylabel: str = None,
+                  max_bytes: int = 100_000) -> str:
+    """Bar chart of a labelled series, e.g. frame.groupby("region", observed=True)["sales"].sum()."""
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.bar([str(label) for label in series.index], series.to_numpy(), color=color)
+    ax.set_xlabel(series.index.name or "")
+    ax.set_ylabel(ylabel or series.name or "")
+    if title:
+        ax.set_title(title)
+    return figure_to_base64(fig, max_bytes=max_bytes)
+
+
+def histogram_png(frame: pd.DataFrame, column: str, color: str = "orange", bins: int = 10,
+                  title: str = None, max_bytes: int = 100_000) -> str:
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.hist(frame[column].dropna().to_numpy(), bins=bins, color=color, edgecolor="black")
+    ax.set_xlabel(column)
+    ax.set_ylabel("Frequency")
+    if title:
+        ax.set_title(title)
+    return figure_to_base64(fig, max_bytes=max_bytes)
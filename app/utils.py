@@ -0,0 +1,169 @@
+import base64
+import csv
+import datetime
+import io
+import itertools
+import os
+
+# Column-name pairs that mark a CSV as an edge list
+EDGE_LIST_COLUMNS = [
+    ("source", "target"),
+    ("src", "dst"),
+    ("from", "to"),
+    ("node1", "node2"),
+    ("u", "v"),
+]
+
+# Column names that suggest the date key of a time series; the values still have to parse
+DATE_COLUMN_NAMES = {"date", "datetime", "timestamp", "time", "day", "period", "month"}
+DATE_FORMATS = ["%Y/%m/%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%m-%d-%Y", "%d.%m.%Y", "%Y%m%d", "%d %b %Y", "%b %d %Y"]
+DATE_SAMPLE_ROWS = 50
+DATE_MIN_PARSED_RATIO = 0.9
+
+_file_cache = {}
+
+
+def read_csv_header(path) -> list:
+    """Column names of a CSV without loading the file."""
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return next(csv.reader(f), [])
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return []
+
+
+def find_edge_columns(header: list):
+    """Returns the (source, target) column names if the header looks like an edge list."""
+    lowered = {col.strip().lower(): col for col in header}
+    for source, target in EDGE_LIST_COLUMNS:
+        if source in lowered and target in lowered:
+            return lowered[source], lowered[target]
+    return None
+
+
+def detect_edge_list_files(files: list) -> list:
+    return [str(f) for f in files if str(f).lower().endswith(".csv") and find_edge_columns(read_csv_header(f))]
+
+
+def read_csv_sample(path, rows: int = DATE_SAMPLE_ROWS):
+    """Header and the first few rows of a CSV, without loading the file."""
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            return next(reader, []), list(itertools.islice(reader, rows))
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return [], []
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_date(text: str) -> bool:
+    text = text.strip()
+    try:
+        datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return True
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.datetime.strptime(text, fmt)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+def looks_like_dates(values: list) -> bool:
+    """
+    True if most non-empty values are full calendar dates. Plain numbers
+    (e.g. a day-of-month column) and names like "Mon" or "Jan" don't count.
+    """
+    values = [str(v).strip() for v in values if v is not None and str(v).strip()]
+    if not values or all(_is_number(v) for v in values):
+        return False
+    parsed = sum(1 for v in values if not _is_number(v) and _is_date(v))
+    return parsed >= DATE_MIN_PARSED_RATIO * len(values)
+
+
+def find_date_column(header: list, rows: list):
+    """
+    Returns the date key column: a date-like name is tried first, then any
+    other column, and either way a sample of its values has to parse as dates.
+    """
+    def named(col):
+        name = str(col).strip().lower()
+        return name in DATE_COLUMN_NAMES or name.endswith(("_date", "_time", "_at")) or name.startswith("date")
+
+    for i, col in sorted(enumerate(header), key=lambda item: not named(item[1])):
+        if looks_like_dates([row[i] for row in rows if i < len(row)]):
+            return col
+    return None
+
+
+def detect_date_files(files: list) -> list:
+    return [str(f) for f in files if str(f).lower().endswith(".csv") and find_date_column(*read_csv_sample(f))]
+
+
+def load_cached(path, cache_dir: str, variant: str, parse, read, write):
+    """
+    Returns parse(path), computed once per file version. The result is saved
+    with write(value, file) in cache_dir next to the upload, keyed by file
+    name, variant, mtime and size, so later calls and later steps (each in
+    its own process) load it with read(file) instead. An unreadable cache
+    file is parsed again.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    name = f"{os.path.basename(path)}.{int(stat.st_mtime)}.{stat.st_size}.{variant}"
+    cache_path = os.path.join(os.path.dirname(path), cache_dir, name)
+    if cache_path in _file_cache:
+        return _file_cache[cache_path]
+
+    value = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                value = read(f)
+        except Exception:
+            value = None
+    if value is None:
+        value = parse(path)
+        # Written under a temporary name so other workers never read a partial file
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                write(value, f)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            print(f"Could not cache {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    _file_cache[cache_path] = value
+    return value
+
+
+def figure_to_base64(fig, max_bytes: int = 100_000, dpi: int = 100) -> str:
+    """
+    Encodes a matplotlib figure as a base64 PNG string, lowering the
+    resolution until the encoded image fits in max_bytes.
+    """
+    import matplotlib.pyplot as plt
+
+    try:
+        while True:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+            encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+            if len(encoded) <= max_bytes or dpi <= 30:
+                return encoded
+            dpi = int(dpi * 0.75)
+    finally:
+        plt.close(fig)
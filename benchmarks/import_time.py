@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark for the API process.
+
+Imports app.main in fresh interpreters with `python -X importtime`, prints the
+slowest imports as a startup profile, and fails if the median import time is
+over budget or if a heavy dependency is imported eagerly.
+
+Usage: python benchmarks/import_time.py [--runs N] [--budget-ms MS] [--top N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET = "app.main"
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS") or "1500")
+
+# Only needed once a request is handled, never at import time
+DEFERRED_MODULES = ["google.genai", "duckdb", "pandas", "numpy", "matplotlib", "networkx", "httpx"]
+
+
+def _run(code: str, *flags) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def profile_import() -> list:
+    """Returns (cumulative_us, self_us, module) rows from one -X importtime run."""
+    result = _run(f"import {TARGET}", "-X", "importtime")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def eagerly_imported() -> list:
+    code = (
+        "import json, sys\n"
+        f"import {TARGET}\n"
+        f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))\n"
+    )
+    return json.loads(_run(code).stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    profile = []
+    for _ in range(args.runs):
+        profile = profile_import()
+        total = next(cumulative for cumulative, _, name in profile if name.strip() == TARGET)
+        totals.append(total / 1000)
+
+    print("Slowest imports (last run, cumulative ms):")
+    for cumulative, self_us, name in sorted(profile, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {self_us / 1000:8.1f} self  {name}")
+
+    median = statistics.median(totals)
+    print(f"\nimport {TARGET}: median {median:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import time {median:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+    eager = eagerly_imported()
+    if eager:
+        failures.append(f"heavy modules imported at startup: {eager}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()